@@ -1,66 +1,76 @@
 import os
+import sys
+import logging
 import time
+import asyncio
 import uvicorn
-from fastapi import FastAPI, Request
+import orjson
+from fastapi import FastAPI, Request, Response
 from pydantic import BaseModel
 
 app = FastAPI()
 
 DATA_SOURCE_VERSION = os.environ.get('DATA_SOURCE_VERSION', 'v1')
 
+# The per-request message is DEBUG, so it is filtered out cheaply at the default INFO level
+log_handler = logging.StreamHandler(sys.stdout)
+log_handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+logger = logging.getLogger("biologist_agent")
+logger.setLevel(logging.getLevelNamesMapping().get(os.environ.get("LOG_LEVEL", "INFO").upper(), logging.INFO))
+logger.addHandler(log_handler)
+logger.propagate = False
+
 # Structure of incoming request
 class SightingRequest(BaseModel):
     zone: str
 
+# The data source is fixed per deployment, so pick its payload once at import
+# v1 simulates slow human-reported sightings via SIMULATED_DELAY_SEC
+if DATA_SOURCE_VERSION == 'v1':
+    # Simulating reported-sightings, data is meant to be sparse
+    SIGHTINGS = [
+        {"id": "human-1", "type": "SRKW", "lat": 45.52, "lon": -123.99},
+        {"id": "human-2", "type": "SRKW", "lat": 45.55, "lon": -123.98}
+    ]
+    SOURCE = "v1 (Human Sightings)"
+    SIMULATED_DELAY_SEC = 1
+
+# if v2, we are simulating new acoustic sensors
+else:
+    SIGHTINGS = [
+        {"id": "sensor-1", "type": "SRKW", "lat": 45.53, "lon": -123.98},
+        {"id": "sensor-2", "type": "SRKW", "lat": 45.54, "lon": -123.97},
+        {"id": "sensor-3", "type": "SRKW", "lat": 45.55, "lon": -124.00}
+    ]
+    SOURCE = "v2 (Acoustic Sensor Feed)"
+    SIMULATED_DELAY_SEC = 0
+
+# Only the zone and duration vary per request, so encode everything around them once
+RESPONSE_PREFIX = b'{"source":' + orjson.dumps(SOURCE) + b',"zone":'
+RESPONSE_SUFFIX = b',"sightings_count":' + orjson.dumps(len(SIGHTINGS)) + b',"sightings":' + orjson.dumps(SIGHTINGS) + b'}'
+
 @app.post('/get_sightings')
 async def get_sightings(request: SightingRequest):
     """
     Returns a list of whale sightings based on service version.
     """
 
-    # Simulate time
-    start_time = time.time()
-
     # Get a 'zone' from the regulator agent
-    #data = await request.json()
     zone = request.zone
 
-    print(f"BIOLOGIST AGENT: Received request for zone '{zone}'. Serving with '{DATA_SOURCE_VERSION}'.")
-
-    # If data comes from human sightings, add delay
-    if DATA_SOURCE_VERSION == 'v1':
-        time.sleep(1)
-
-        # Simulating reported-sightings, data is meant to be sparse
-        sightings = [
-            {"id": "human-1", "type": "SRKW", "lat": 45.52, "lon": -123.99},
-            {"id": "human-2", "type": "SRKW", "lat": 45.55, "lon": -123.98}
-        ]
-
-        source = "v1 (Human Sightings)"
-
-    # if v2, we are simulating new acoustic sensors
-    else:
-        sightings = [
-            {"id": "sensor-1", "type": "SRKW", "lat": 45.53, "lon": -123.98},
-            {"id": "sensor-2", "type": "SRKW", "lat": 45.54, "lon": -123.97},
-            {"id": "sensor-3", "type": "SRKW", "lat": 45.55, "lon": -124.00}
-        ]
-
-        source = "v2 (Acoustic Sensor Feed)"
+    logger.debug("BIOLOGIST AGENT: Received request for zone '%s'. Serving with '%s'.", zone, DATA_SOURCE_VERSION)
 
-    # Track how long data retrieval took
-    duration = time.time() - start_time
+    # Simulate time, tracking how long data retrieval took
+    duration = 0.0
+    if SIMULATED_DELAY_SEC:
+        start_time = time.perf_counter()
+        await asyncio.sleep(SIMULATED_DELAY_SEC)
+        duration = time.perf_counter() - start_time
 
-    return {
-        "source": source,
-        "zone": zone,
-        "duration_sec": duration,
-        "sightings_count": len(sightings),
-        "sightings": sightings
-    }
+    body = RESPONSE_PREFIX + orjson.dumps(zone) + b',"duration_sec":' + orjson.dumps(duration) + RESPONSE_SUFFIX
+    return Response(content=body, media_type="application/json")
 
 # Local testing only - this is meant to run via gunicorn in Cloud Run
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8081))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    uvicorn.run(app, host="0.0.0.0", port=port, loop="uvloop", http="httptools", access_log=False)
@@ -1,7 +1,10 @@
 import os
+import sys
+import logging
 import uvicorn
-import json
+import orjson
 import time
+import functools
 import google.generativeai as genai
 from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
@@ -9,6 +12,14 @@ from pydantic import BaseModel
 # Initialize FastAPI app
 app = FastAPI()
 
+# One line per Gemini call, written straight to stdout; negligible next to the API round trip
+log_handler = logging.StreamHandler(sys.stdout)
+log_handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+logger = logging.getLogger("llm_proxy")
+logger.setLevel(logging.getLevelNamesMapping().get(os.environ.get("LOG_LEVEL", "INFO").upper(), logging.INFO))
+logger.addHandler(log_handler)
+logger.propagate = False
+
 # Pydantic model for the incoming request body
 class PromptRequest(BaseModel):
     prompt: str
@@ -24,43 +35,46 @@ def get_gemini_api_key():
         raise HTTPException(status_code=500, detail="GOOGLE_API_KEY secret not configured")
     return api_key
 
-# Configure the Gemini API with the retrieved key
-try:
-    gemini_api_key = get_gemini_api_key()
-    genai.configure(api_key=gemini_api_key)
-    llm = genai.GenerativeModel('gemini-2.0-flash')
-except HTTPException as e:
-    # This will prevent the application from starting if the secret is not available
-    print(f"Error: {e.detail}")
-    exit(1)
+# Configure the Gemini API with the retrieved key on first use, then reuse the model.
+# A missing secret fails the request with a 500 instead of crash-looping the container.
+@functools.cache
+def get_model():
+    genai.configure(api_key=get_gemini_api_key())
+    return genai.GenerativeModel('gemini-2.0-flash')
+
+# Warm the model at import when the secret is present; otherwise the first request retries
+if os.environ.get("GOOGLE_API_KEY"):
+    get_model()
 
 @app.post("/generate_summary")
-async def generate_summary(request: PromptRequest):
+async def generate_summary(request: PromptRequest) -> dict:
     """
     Receives a prompt, sends it to the Gemini API, and returns the response.
     """
+    model = get_model()
+
     try:
 
         start_time = time.time()
-        print("LLM PROXY: Received request. Calling Gemini API...")
+        logger.debug("LLM PROXY: Received request. Calling Gemini API...")
 
         # Generate content based on the prompt
-        response = await llm.generate_content_async(request.prompt)
+        response = await model.generate_content_async(request.prompt)
 
         end_time = time.time()
         duration = end_time - start_time
-        print(f"LLM PROXY: Gemini API call successful. Duration: {duration:.2f} seconds.")
+        logger.info("LLM PROXY: Gemini API call successful. Duration: %.2f seconds.", duration)
 
-        clean_response = response.text.strip().replace('```json', '').replace('```', '')
-        return json.loads(clean_response)
+        clean_response = response.text.strip().removeprefix('```json').removeprefix('```').removesuffix('```').strip()
+        return orjson.loads(clean_response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/")
-def read_root():
+def read_root() -> dict:
     return {"message": "Gemini API service is running."}
 
 # Local testing only - this is meant to run via gunicorn in Cloud Run
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8083))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=port, loop="uvloop", http="httptools", access_log=False)
\ No newline at end of file
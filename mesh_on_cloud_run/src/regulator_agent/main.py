@@ -1,11 +1,16 @@
 import os
-import json
+import sys
+import queue
+import logging
+from logging.handlers import QueueHandler, QueueListener
 import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
 import httpx
 import uvicorn 
-import pandas as pd
-import geopandas as gpd
-from geopy.distance import great_circle 
+import numpy as np
+import orjson
+from cachetools import TTLCache
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 
@@ -15,18 +20,107 @@ VESSEL_AGENT_URL = os.environ.get("VESSEL_AGENT_URL", "http://127.0.0.1:8082/get
 LLM_PROXY_URL = os.environ.get("LLM_PROXY_URL", "http://127.0.0.1:8083/generate_summary")
 PROJECT_ID=os.environ.get("PROJECT_ID", "multi-agent-run-demo")
 REGION = os.environ.get("REGION", "us-central1")
+AGENT_CACHE_TTL_SEC = float(os.environ.get("AGENT_CACHE_TTL_SEC", 0))  # 0 disables caching
+MAX_RESPONSE_BYTES = int(os.environ.get("MAX_RESPONSE_BYTES", 10 * 1024 * 1024))
 
-print("--- AGENT STARTUP CONFIGURATION ---")
-print(f"BIOLOGIST_AGENT_URL on startup: {BIOLOGIST_AGENT_URL}")
-print(f"VESSEL_AGENT_URL on startup: {VESSEL_AGENT_URL}")
-print("------------------------------------")
+# Proximity analysis
+EARTH_RADIUS_METERS = 6371000
+RISK_DISTANCE_METERS = 1852  # 1 nautical mile
+METERS_PER_DEGREE_LAT = EARTH_RADIUS_METERS * np.pi / 180
+GRID_MAX_LAT = 89.0  # beyond this the grid prune falls back to comparing every pair
+
+# Hand records to a background thread so the event loop never blocks on stdout; stopped in lifespan to flush
+log_handler = logging.StreamHandler(sys.stdout)
+log_handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+log_listener = QueueListener(queue.SimpleQueue(), log_handler)
+logger = logging.getLogger("regulator_agent")
+logger.setLevel(logging.getLevelNamesMapping().get(os.environ.get("LOG_LEVEL", "INFO").upper(), logging.INFO))
+logger.addHandler(QueueHandler(log_listener.queue))
+logger.propagate = False
+log_listener.start()
+
+logger.info("--- AGENT STARTUP CONFIGURATION ---")
+logger.info("BIOLOGIST_AGENT_URL on startup: %s", BIOLOGIST_AGENT_URL)
+logger.info("VESSEL_AGENT_URL on startup: %s", VESSEL_AGENT_URL)
+logger.info("------------------------------------")
+
+# Shared client for all downstream calls, reusing keep-alive connections across requests.
+# Keep max_connections in line with Cloud Run concurrency.
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=60),
+    timeout=httpx.Timeout(connect=5.0, read=120.0, write=10.0, pool=5.0)
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await http_client.aclose()
+    log_listener.stop()
+
+# Recent downstream responses keyed by (service_url, zone), plus the fetches currently in flight.
+# Opt-in only: cached biologist data hides the v1/v2 traffic split between requests.
+agent_cache = TTLCache(maxsize=1024, ttl=AGENT_CACHE_TTL_SEC) if AGENT_CACHE_TTL_SEC > 0 else None
+agent_fetches: dict[tuple[str, str], asyncio.Task] = {}
 
 # App info
-app = FastAPI(title="ODFW Orca Guardian")
-http_client = httpx.AsyncClient(timeout=120.0)
+app = FastAPI(title="ODFW Orca Guardian", lifespan=lifespan)
+
+class ResponseTooLargeError(Exception):
+    """Raised when a downstream response body exceeds MAX_RESPONSE_BYTES."""
+
+async def read_limited_body(response: httpx.Response) -> bytes:
+    """
+    Reads a streamed response body, refusing to buffer more than MAX_RESPONSE_BYTES.
+    """
+    content_length = response.headers.get("content-length")
+    if content_length and int(content_length) > MAX_RESPONSE_BYTES:
+        raise ResponseTooLargeError(f"Response of {content_length} bytes exceeds {MAX_RESPONSE_BYTES} byte limit")
+
+    body = bytearray()
+    async for chunk in response.aiter_bytes():
+        body += chunk
+        if len(body) > MAX_RESPONSE_BYTES:
+            raise ResponseTooLargeError(f"Response exceeds {MAX_RESPONSE_BYTES} byte limit")
+    return bytes(body)
+
+# --- Geospatial Helpers ---
+def haversine_meters(phi1, lam1, phi2, lam2):
+    """
+    Great-circle distance in meters between points given in radians. Broadcasts over NumPy arrays.
+    """
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin((lam2 - lam1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(a))
 
 # --- Main Agentic Logic ---
 async def get_data_from_agent(service_url: str, zone: str) -> dict:
+    """
+    Returns the agent's data for a zone, served from a short-lived cache when enabled.
+    Concurrent requests for the same service and zone then share a single downstream call.
+    """
+    if agent_cache is None:
+        return await fetch_agent_data(service_url, zone)
+
+    key = (service_url, zone)
+    cached = agent_cache.get(key)
+    if cached is not None:
+        return cached
+
+    fetch = agent_fetches.get(key)
+    if fetch is None:
+        fetch = asyncio.create_task(fetch_agent_data(service_url, zone))
+        agent_fetches[key] = fetch
+
+        def store_result(task: asyncio.Task):
+            agent_fetches.pop(key, None)
+            if not task.cancelled() and task.exception() is None:
+                agent_cache[key] = task.result()
+
+        fetch.add_done_callback(store_result)
+
+    # Shield so one caller being cancelled doesn't cancel the fetch for everyone else
+    return await asyncio.shield(fetch)
+
+async def fetch_agent_data(service_url: str, zone: str) -> dict:
     """
     Helper function to call another agent or toolset.
     This is intended to be another Cloud Run service within the same service mesh.
@@ -34,74 +128,111 @@ async def get_data_from_agent(service_url: str, zone: str) -> dict:
     if not service_url:
         raise HTTPException(status_code=500, detail="Service URL for a dependency is not configured.")
     try:
-        response = await http_client.post(service_url, json={"zone": zone})
-        response.raise_for_status()
-        return response.json()
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=503, detail=f"Downstream service unavailable {e.response.text}")
+        async with http_client.stream("POST", service_url, json={"zone": zone}) as response:
+            body = await read_limited_body(response)
     except httpx.RequestError as e:
         raise HTTPException(status_code=504, detail="Could not connect to downstream service")
+    except ResponseTooLargeError as e:
+        raise HTTPException(status_code=502, detail=f"Downstream service response too large: {e}")
+
+    if response.is_error:
+        raise HTTPException(status_code=503, detail=f"Downstream service unavailable {body.decode(errors='replace')}")
+    return orjson.loads(body)
     
 def analyze_proximity_risk(whale_data: dict, vessel_data: dict) -> list[dict]:
     """
-    Analyzes proximity risk using Pandas and GeoPandas. Initially using DuckDB but issues with CPU architecture.
+    Analyzes proximity risk using NumPy on the plain sighting/vessel dicts. Initially using DuckDB, then Pandas and GeoPandas.
     """
-    print("REGULATOR AGENT: Fusing whale and vessels data...")
+    logger.debug("REGULATOR AGENT: Fusing whale and vessels data...")
 
     whale_sightings = whale_data.get("sightings", [])
     vessel_tracks = vessel_data.get("vessels", [])
 
     if not whale_sightings or not vessel_tracks:
-        print("REGULATOR AGENT: Pre-condition check failed. Skipping analysis.")
+        logger.info("REGULATOR AGENT: Pre-condition check failed. Skipping analysis.")
         return []
 
     try:
-        # 1. Convert raw data into Pandas DataFrames
-        whales_df = pd.DataFrame(whale_sightings)
-        vessels_df = pd.DataFrame(vessel_tracks)
-
-        # 2. Create GeoPandas GeoDataFrames with a geometry column
-        whales_gdf = gpd.GeoDataFrame(
-            whales_df, geometry=gpd.points_from_xy(whales_df.lon, whales_df.lat)
-        )
-        vessels_gdf = gpd.GeoDataFrame(
-            vessels_df, geometry=gpd.points_from_xy(vessels_df.lon, vessels_df.lat)
-        )
-
-        # 3. Perform a cross join to create all possible pairs
-        all_pairs = whales_gdf.merge(vessels_gdf, how="cross", suffixes=('_whale', '_vessel'))
-
-        # 4. Calculate the distance for each pair using a reliable apply method
-        def calculate_distance(row):
-            return great_circle(
-                (row['geometry_whale'].y, row['geometry_whale'].x),
-                (row['geometry_vessel'].y, row['geometry_vessel'].x)
-            ).meters
-
-        all_pairs['distance_meters'] = all_pairs.apply(calculate_distance, axis=1)
-
-        # 5. Filter the results to find only those within the 1852-meter threshold
-        risk_events_df = all_pairs[all_pairs['distance_meters'] <= 1852].copy()
-
-        # 6. Select, rename, and format the final columns
-        risk_events_df.rename(columns={
-            'id_vessel': 'vessel_id',
-            'class': 'vessel_class',
-            'id_whale': 'whale_sighting_id'
-        }, inplace=True)
-        
-        final_report_df = risk_events_df[[
-            'vessel_id', 'vessel_class', 'whale_sighting_id', 'distance_meters'
-        ]]
-
-        # 7. Return the result as a standard list of dictionaries
-        return final_report_df.round({'distance_meters': 0}).to_dict('records')
+        # 1. Pull coordinates into contiguous NumPy arrays for vectorized math
+        lat_w = np.asarray([s["lat"] for s in whale_sightings], dtype=float)
+        lon_w = np.asarray([s["lon"] for s in whale_sightings], dtype=float)
+        lat_v = np.asarray([v["lat"] for v in vessel_tracks], dtype=float)
+        lon_v = np.asarray([v["lon"] for v in vessel_tracks], dtype=float)
+        phi_w, lam_w = np.deg2rad(lat_w), np.deg2rad(lon_w)
+        phi_v, lam_v = np.deg2rad(lat_v), np.deg2rad(lon_v)
+
+        # 2. Bucket whales into grid cells at least one risk radius wide, so any pair within
+        #    range sits in the same or a neighbouring cell. Columns wrap around at +/-180 degrees.
+        dlat_max = RISK_DISTANCE_METERS / METERS_PER_DEGREE_LAT
+        max_abs_lat = np.abs(np.concatenate((lat_w, lat_v))).max() + dlat_max
+
+        if max_abs_lat > GRID_MAX_LAT:
+            # Near the poles longitude cells get too narrow to bound the search, so compare every pair
+            candidate_w = np.repeat(np.arange(len(lat_w)), len(lat_v))
+            candidate_v = np.tile(np.arange(len(lat_v)), len(lat_w))
+        else:
+            n_cols = int(360 // (dlat_max / np.cos(np.deg2rad(max_abs_lat))))
+            dlon_cell = 360 / n_cols
+
+            def cell_keys(lat, lon):
+                rows = np.floor(lat / dlat_max).astype(int)
+                cols = np.floor((lon + 180) / dlon_cell).astype(int) % n_cols
+                return zip(rows.tolist(), cols.tolist())
+
+            whale_cells = defaultdict(list)
+            for i, key in enumerate(cell_keys(lat_w, lon_w)):
+                whale_cells[key].append(i)
+
+            # 3. Gather candidate pairs from each vessel's 3x3 cell neighborhood
+            candidate_w, candidate_v = [], []
+            for j, (row, col) in enumerate(cell_keys(lat_v, lon_v)):
+                for d_row in (-1, 0, 1):
+                    for d_col in (-1, 0, 1):
+                        cell_whales = whale_cells.get((row + d_row, (col + d_col) % n_cols))
+                        if cell_whales:
+                            candidate_w.extend(cell_whales)
+                            candidate_v.extend([j] * len(cell_whales))
+
+        if not len(candidate_w):
+            return []
+
+        # 4. Distance + threshold in a single vectorized pass over the candidates only (no N x M matrix)
+        candidate_w = np.asarray(candidate_w)
+        candidate_v = np.asarray(candidate_v)
+        distances = haversine_meters(phi_w[candidate_w], lam_w[candidate_w], phi_v[candidate_v], lam_v[candidate_v])
+        within = distances <= RISK_DISTANCE_METERS
+        whale_idx, vessel_idx, distances = candidate_w[within], candidate_v[within], distances[within]
+        order = np.lexsort((vessel_idx, whale_idx))
+
+        # 5. Return the result as a standard list of dictionaries, ordered by whale then vessel
+        return [
+            {
+                "vessel_id": vessel_tracks[j]["id"],
+                "vessel_class": vessel_tracks[j]["class"],
+                "whale_sighting_id": whale_sightings[i]["id"],
+                "distance_meters": round(distance, 0),
+            }
+            for i, j, distance in zip(whale_idx[order].tolist(), vessel_idx[order].tolist(), distances[order].tolist())
+        ]
 
     except Exception as e:
-        print(f"PANDAS/GEOPANDAS ANALYSIS ERROR: {e}") 
-        raise HTTPException(status_code=500, detail=f"Data analysis with Pandas failed: {e}")
+        logger.error("NUMPY ANALYSIS ERROR: %s", e)
+        raise HTTPException(status_code=500, detail=f"Data analysis with NumPy failed: {e}")
     
 # --- GenAI Summarization ---
+PROMPT_TMPL = """
+    You are an expert risk assessment analyst for the Oregon Department of Fish and Wildlife (ODFW).
+    Your task is to analyze a list of close-proximity events between vessels and endangered Southern Resident Killer Whales (SRKWs) in the '{zone}' zone.
+
+    Here is the structured data of the risk events:
+    {events}
+
+    Based on this data, provide a JSON object with three keys:
+    1. "summary": A concise, human-readable paragraph describing the findings. Mention the number of incidents and highlight the vessel class most involved (e.g., "Recreational").
+    2. "risk_level": Classify the overall risk as "Low", "Moderate", "High", or "Critical".
+    3. "recommended_action": Suggest a concrete next step for ODFW. For recreational vessels, suggest educational outreach. For commercial vessels, suggest direct contact.
+    """
+
 async def get_summary_and_action(risk_events: list[dict], zone:str) -> dict:
     """
     Uses Gemini on Vertex AI to interpret analysis and generate summary.
@@ -113,28 +244,17 @@ async def get_summary_and_action(risk_events: list[dict], zone:str) -> dict:
             "recommended_action": "No action required. Continue monitoring."
         }
     
-    print("REGULATOR AGENT: Delegating to Gemini for generative summary...")
-
-    prompt = f"""
-    You are an expert risk assessment analyst for the Oregon Department of Fish and Wildlife (ODFW).
-    Your task is to analyze a list of close-proximity events between vessels and endangered Southern Resident Killer Whales (SRKWs) in the '{zone}' zone.
-
-    Here is the structured data of the risk events:
-    {risk_events}
+    logger.debug("REGULATOR AGENT: Delegating to Gemini for generative summary...")
 
-    Based on this data, provide a JSON object with three keys:
-    1. "summary": A concise, human-readable paragraph describing the findings. Mention the number of incidents and highlight the vessel class most involved (e.g., "Recreational").
-    2. "risk_level": Classify the overall risk as "Low", "Moderate", "High", or "Critical".
-    3. "recommended_action": Suggest a concrete next step for ODFW. For recreational vessels, suggest educational outreach. For commercial vessels, suggest direct contact.
-    """
+    prompt = PROMPT_TMPL.format(zone=zone, events=orjson.dumps(risk_events).decode())
 
     try:
-        response = await http_client.post(LLM_PROXY_URL, json={"prompt": prompt})
-        # Check if the request to the proxy was successful before proceeding
-        response.raise_for_status() 
-        return (response.json())
-    except Exception as e:
-        print(f"Error calling AI model: {e}")
+        async with http_client.stream("POST", LLM_PROXY_URL, json={"prompt": prompt}) as response:
+            # Check if the request to the proxy was successful before proceeding
+            response.raise_for_status()
+            return orjson.loads(await read_limited_body(response))
+    except (httpx.HTTPError, httpx.InvalidURL, orjson.JSONDecodeError, ResponseTooLargeError) as e:  # expected failures only
+        logger.warning("Error calling AI model: %s", e)
         # If LLM fails, still return raw data with an unknown risk level
         return {
             "summary": "AI summary generaton failed. See raw data.",
@@ -147,36 +267,34 @@ class RiskRequest(BaseModel):
     zone: str
 
 @app.post('/check_risk')
-async def check_risk(request: RiskRequest):
+async def check_risk(request: RiskRequest) -> dict:
     """
     Orchestrates agent crew and uses LLM to assess and summarize risk for SRKWs.
     """
 
     zone = request.zone
-    print(f"\n--- REGULATOR AGENT: New risk assessment for zone: {zone} ---")
-
-    # 1. Delegate data collection to crew
-    print("REGULATOR AGENT: Delegating to biologist and vessel agents...")
-    whale_task = get_data_from_agent(BIOLOGIST_AGENT_URL, zone)
-    vessel_task = get_data_from_agent(VESSEL_AGENT_URL, zone)
-    results = await asyncio.gather(whale_task, vessel_task, return_exceptions=True)
-
-    # Error handling if issues with delegating
-    if any(isinstance(result, Exception) for result in results):
-        for result in results:
-            if isinstance(result, Exception):
-                raise result
-            
-    whale_data, vessel_data = results
-    print(f"REGULATOR AGENT: Received data from {whale_data['source']} and vessel feed.")
-
-    # 2. Synthesize - analyze data
-    risk_events = analyze_proximity_risk(whale_data, vessel_data)
-    
+    logger.info("--- REGULATOR AGENT: New risk assessment for zone: %s ---", zone)
+
+    # 1. Delegate data collection to crew, failing fast if either agent errors out
+    logger.debug("REGULATOR AGENT: Delegating to biologist and vessel agents...")
+    try:
+        async with asyncio.TaskGroup() as tg:
+            whale_task = tg.create_task(get_data_from_agent(BIOLOGIST_AGENT_URL, zone))
+            vessel_task = tg.create_task(get_data_from_agent(VESSEL_AGENT_URL, zone))
+    except ExceptionGroup as eg:
+        # Surface the first delegation error (e.g. HTTPException) as-is
+        raise eg.exceptions[0]
+
+    whale_data, vessel_data = whale_task.result(), vessel_task.result()
+    logger.debug("REGULATOR AGENT: Received data from %s and vessel feed.", whale_data['source'])
+
+    # 2. Synthesize - analyze data in a worker thread so the event loop keeps serving other requests
+    risk_events = await asyncio.to_thread(analyze_proximity_risk, whale_data, vessel_data)
+
     # 3. Summarize using LLM
     ai_summary = await get_summary_and_action(risk_events, zone)
-    
-    print("REGULATOR AGENT: Assessment complete! Returning final result.")
+
+    logger.debug("REGULATOR AGENT: Assessment complete! Returning final result.")
 
     return {
         "zone": zone,
@@ -193,4 +311,4 @@ async def check_risk(request: RiskRequest):
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8080))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=port, loop="uvloop", http="httptools", access_log=False)
\ No newline at end of file
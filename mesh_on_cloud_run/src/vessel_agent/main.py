@@ -1,9 +1,22 @@
 import os
 import uvicorn
-from fastapi import FastAPI, Request
+import orjson
+from fastapi import FastAPI, Request, Response
 
 app = FastAPI()
 
+# TODO: Use real-world AIS data feed
+vessels = [
+    {"id": "vessel-A", "class": "Ferry", "lat": 45.53, "lon": -123.985},
+    {"id": "vessel-B", "class": "Recreational", "lat": 45.52, "lon": -123.991},
+    {"id": "vessel-C", "class": "Cargo", "lat": 45.56, "lon": -124.01},
+    {"id": "vessel-D", "class": "Recreational", "lat": 45.54, "lon": -123.975}
+]
+
+# The vessel feed is static, so encode everything around the zone once at import
+VESSEL_RESPONSE_PREFIX = b'{"source":"Mocked AIS Feed","zone":'
+VESSEL_RESPONSE_SUFFIX = b',"vessel_count":' + orjson.dumps(len(vessels)) + b',"vessels":' + orjson.dumps(vessels) + b'}'
+
 @app.post('/get_vessel_tracks')
 async def get_vessel_tracks(request: Request):
     """
@@ -11,26 +24,15 @@ async def get_vessel_tracks(request: Request):
     """
 
     # We get the zone from the regulator agent
-    data = await request.json()
+    data = orjson.loads(await request.body())
     zone = data.get('zone', 'unknown')
 
-    # TODO: Use real-world AIS data feed
-    vessels = [
-        {"id": "vessel-A", "class": "Ferry", "lat": 45.53, "lon": -123.985},
-        {"id": "vessel-B", "class": "Recreational", "lat": 45.52, "lon": -123.991},
-        {"id": "vessel-C", "class": "Cargo", "lat": 45.56, "lon": -124.01},
-        {"id": "vessel-D", "class": "Recreational", "lat": 45.54, "lon": -123.975}
-    ]
-
-    return {
-        "source": "Mocked AIS Feed",
-        "zone": zone,
-        "vessel_count": len(vessels),
-        "vessels": vessels
-    }
+    # Only the zone varies per request, so splice it into the pre-encoded payload
+    body = VESSEL_RESPONSE_PREFIX + orjson.dumps(zone) + VESSEL_RESPONSE_SUFFIX
+    return Response(content=body, media_type="application/json")
 
 # For local testing
 if __name__ == "__main__":
     # Use same port as other agent
     port = int(os.environ.get('PORT', 8082))
-    uvicorn.run(app, host='0.0.0.0', port=port)
\ No newline at end of file
+    uvicorn.run(app, host='0.0.0.0', port=port, loop='uvloop', http='httptools', access_log=False)
\ No newline at end of file